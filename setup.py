@@ -41,9 +41,9 @@ REQUIRED_PACKAGES = [
     "casfs==0.1.1",
     "fs",
     "fs-gcsfs",
-    "mlflow==1.10.0",
+    "mlflow==1.27.0",
     "numpy>=1.18.0",
-    "sqlalchemy",
+    "sqlalchemy>=1.4.40",
     "tqdm>=4.42.1",
 ]
 
@@ -54,7 +54,7 @@ setup(
     description='Shared tooling for Blueshift research.',
     long_description=readme(),
     long_description_content_type="text/markdown",
-    python_requires='>=3.6.0',
+    python_requires='>=3.7.0',
     author='Sam Ritchie',
     author_email='samritchie@google.com',
     url='https://github.com/google/uv-metrics',
@@ -64,6 +64,8 @@ setup(
     extras_require={
         "tf": ["tensorflow"],
         "tf-gpu": ["tensorflow-gpu"],
+        "orjson": ["orjson"],
+        "msgspec": ["msgspec>=0.18"],
     },
     include_package_data=True,
 )
@@ -15,12 +15,16 @@
 # limitations under the License.
 """Tests for the filesystem reader and reporter."""
 
+import math
 import string
 import uuid
 from contextlib import closing
 
 import hypothesis.strategies as st
+import numpy as np
+import uv.fs.reader as fs_reader
 import uv.fs.util as u
+import uv.util as uv_util
 from casfs import CASFS
 from hypothesis import given
 from uv.fs.reader import CASReader, FSReader
@@ -63,6 +67,231 @@ def test_fs_roundtrip(tmpdir):
         # Checking for a key that doesn't exist returns an empty list.
         assert reader.read("face") == []
 
+        # read_iter streams the same entries back lazily.
+        assert list(reader2.read_iter("a")) == a_entries
+        assert list(reader2.read_iter("face")) == []
+
+
+def test_fs_nan_roundtrip(tmpdir):
+  """Non-finite floats survive the trip through the filesystem."""
+  dir_path = str(tmpdir)
+  with closing(FSReporter(dir_path).stepped()) as reporter:
+    with closing(reporter.reader()) as reader:
+      reporter.report_all(0, {"a": float("nan"), "b": float("inf")})
+      reporter.report_all(1, {"a": 1.5})
+
+      a, b = reader.read("a"), reader.read("b")
+      assert math.isnan(a[0]["value"])
+      assert a[1] == {"step": 1, "value": 1.5}
+      assert b == [{"step": 0, "value": float("inf")}]
+
+
+def test_fs_flush_every(tmpdir):
+  dir_path = str(tmpdir)
+
+  with pytest.raises(ValueError):
+    FSReporter(dir_path, flush_every=0)
+
+  reporter = FSReporter(dir_path, flush_every=2).stepped()
+  with closing(FSReader(dir_path, cache_size=0)) as reader:
+    # nothing hits the filesystem until flush_every steps have been reported.
+    reporter.report_all(0, {"a": 1})
+    assert reader.read("a") == []
+
+    reporter.report_all(1, {"a": 2})
+    assert reader.read("a") == [{
+        "step": 0,
+        "value": 1
+    }, {
+        "step": 1,
+        "value": 2
+    }]
+
+    # close flushes any stragglers.
+    reporter.report_all(2, {"a": 3})
+    reporter.close()
+    assert reader.read("a")[-1] == {"step": 2, "value": 3}
+
+
+def test_fs_flush_failure_keeps_buffer(tmpdir, monkeypatch):
+  dir_path = str(tmpdir)
+  reporter = FSReporter(dir_path, flush_every=10)
+  stepped = reporter.stepped()
+
+  stepped.report_all(0, {"a": 1, "b": 2})
+  stepped.report_all(1, {"a": 3, "b": 4})
+
+  # fail on the second file, after the first one has been written.
+  cache_open = reporter._cache.open
+  calls = []
+
+  def flaky_open(path, mode):
+    calls.append(path)
+    if len(calls) == 2:
+      raise IOError("disk full")
+    return cache_open(path, mode)
+
+  monkeypatch.setattr(reporter._cache, "open", flaky_open)
+  with pytest.raises(IOError):
+    stepped.flush()
+
+  # retrying writes the lines that failed, without duplicating the ones that
+  # made it out.
+  stepped.flush()
+  reporter.close()
+
+  with closing(FSReader(dir_path)) as reader:
+    assert reader.read_all(["a", "b"]) == {
+        "a": [{
+            "step": 0,
+            "value": 1
+        }, {
+            "step": 1,
+            "value": 3
+        }],
+        "b": [{
+            "step": 0,
+            "value": 2
+        }, {
+            "step": 1,
+            "value": 4
+        }]
+    }
+
+
+def test_fs_read_cache(tmpdir):
+  dir_path = str(tmpdir)
+  with closing(FSReporter(dir_path).stepped()) as reporter:
+    with closing(FSReader(dir_path, cache_size=1)) as reader:
+      reporter.report_all(0, {"a": 1, "b": 2})
+      assert reader.read("a") == [{"step": 0, "value": 1}]
+
+      # new writes change the file's size, which invalidates the cached entry.
+      reporter.report_all(1, {"a": 3})
+      assert reader.read("a") == [{
+          "step": 0,
+          "value": 1
+      }, {
+          "step": 1,
+          "value": 3
+      }]
+
+      # each read returns a fresh list, but the records are shared.
+      reader.read("a").clear()
+      assert len(reader.read("a")) == 2
+      assert reader.read("a")[0] is reader.read("a")[0]
+
+      # only cache_size entries are kept around.
+      assert reader.read("b") == [{"step": 0, "value": 2}]
+      assert len(reader._cache) == 1
+
+      reader.clear_cache()
+      assert len(reader._cache) == 0
+
+    # caching is off by default.
+    with closing(FSReader(dir_path)) as reader:
+      reader.read("a")
+      assert len(reader._cache) == 0
+
+
+def test_fs_read_arrays(tmpdir):
+  dir_path = str(tmpdir)
+  with closing(FSReporter(dir_path).stepped()) as reporter:
+    with closing(reporter.reader()) as reader:
+      reporter.report_all(0, {"a": 1, "b": 1.5})
+      reporter.report_all(1, {"a": 2.5, "b": float("nan")})
+
+      steps, values = reader.read_arrays("a")
+      assert steps.dtype == np.int64
+      assert values.dtype == np.float64
+      assert steps.tolist() == [0, 1]
+      assert values.tolist() == [1.0, 2.5]
+
+      # NaN isn't valid strict json, so this goes through the fallback parser.
+      steps, values = reader.read_arrays("b")
+      assert steps.tolist() == [0, 1]
+      assert values[0] == 1.5 and np.isnan(values[1])
+
+      steps, values = reader.read_arrays("face")
+      assert len(steps) == 0 and len(values) == 0
+
+
+def test_fs_read_arrays_step_key(tmpdir, monkeypatch):
+  dir_path = str(tmpdir)
+  with closing(FSReporter(dir_path).stepped(step_key="epoch")) as reporter:
+    reporter.report_all(3, {"a": 1})
+    reporter.report_all(4, {"a": 2.5})
+
+  with closing(FSReader(dir_path, step_key="epoch")) as reader:
+    steps, values = reader.read_arrays("a")
+    assert steps.tolist() == [3, 4]
+    assert values.tolist() == [1.0, 2.5]
+
+    # the generic fallback honors step_key too.
+    monkeypatch.setattr(fs_reader, "msgspec", None)
+    steps, values = reader.read_arrays("a")
+    assert steps.tolist() == [3, 4]
+    assert values.tolist() == [1.0, 2.5]
+
+
+def test_fs_read_many(tmpdir):
+  dir_path = str(tmpdir)
+  with closing(FSReporter(dir_path).stepped()) as reporter:
+    for step in range(5):
+      reporter.report_all(step, {"k{}".format(i): step * i for i in range(20)})
+
+  keys = ["k{}".format(i) for i in range(20)]
+  expected = {
+      k: [{
+          "step": step,
+          "value": step * i
+      } for step in range(5)] for i, k in enumerate(keys)
+  }
+
+  with closing(FSReader(dir_path, cache_size=5)) as reader:
+    assert reader.read_many([]) == {}
+
+    # missing keys map to empty lists, and duplicates collapse into one entry.
+    assert reader.read_many(["k0", "face", "k0"]) == {
+        "k0": expected["k0"],
+        "face": []
+    }
+
+    # hammer a small cache from many threads; every result stays correct and
+    # the cache never grows past its bound.
+    for _ in range(5):
+      assert reader.read_many(keys * 3, max_workers=16) == expected
+      assert len(reader._cache) <= 5
+
+    assert reader.read_many(keys) == reader.read_all(keys)
+
+
+@pytest.mark.parametrize("with_orjson", [True, False])
+def test_fs_read_without_orjson(tmpdir, monkeypatch, with_orjson):
+  """Without orjson, files are parsed as text with the stdlib; the results must
+  match, NaN and blank lines included.
+
+  """
+  tmpdir.join("a.jsonl").write_binary(b'{"step": 0, "value": 1.5}\n'
+                                      b'\n'
+                                      b'{"step": 1, "value": NaN}\n'
+                                      b'   \n'
+                                      b'{"step": 2, "value": "\xc3\xa9"}\n')
+
+  if not with_orjson:
+    monkeypatch.setattr(uv_util, "orjson", None)
+    assert u.jsonl_read_mode() == 'r'
+
+  with closing(FSReader(str(tmpdir))) as reader:
+    for entries in (reader.read("a"), list(reader.read_iter("a"))):
+      assert [m["step"] for m in entries] == [0, 1, 2]
+      assert entries[0]["value"] == 1.5
+      assert math.isnan(entries[1]["value"])
+      assert entries[2]["value"] == "\u00e9"
+
+    assert reader.read("face") == []
+    assert list(reader.read_iter("face")) == []
+
 
 @given(
     st.dictionaries(st.text(alphabet=list(string.ascii_lowercase +
@@ -85,6 +314,7 @@ def test_fs_many(tmpdir, m):
 
       # check that the reader returns everything in the map written to the fs.
       assert reader.read_all(list(m.keys())) == expected
+      assert reader.read_many(list(m.keys())) == expected
 
       # Check that the reader has all the goods!
       assert set(reader.keys()) == set(m.keys())
@@ -313,3 +313,41 @@ def test_from_thunk(mem):
   # check that the close is passthrough:
   with pytest.raises(IOError):
     ThrowCloseReporter().from_thunk(lambda: 10).close()
+
+
+class FlushCounter(b.AbstractReporter):
+
+  def __init__(self):
+    self.flushes = 0
+
+  def report(self, step, k, v):
+    return None
+
+  def flush(self):
+    self.flushes += 1
+
+
+def test_flush_passes_through_combinators():
+  # the default is a no-op.
+  assert TestReporter().flush() is None
+
+  base = FlushCounter()
+  other = FlushCounter()
+  on_false = FlushCounter()
+
+  wrapped = [
+      base.with_prefix("p"),
+      base.with_suffix("s"),
+      base.stepped(),
+      base.map_values(lambda step, v: v),
+      base.from_thunk(lambda: {}),
+      base.plus(other),
+      base.filter_step(lambda step: True, on_false=on_false),
+  ]
+
+  for reporter in wrapped:
+    reporter.flush()
+
+  assert base.flushes == len(wrapped)
+  assert other.flushes == 1
+  assert on_false.flushes == 1
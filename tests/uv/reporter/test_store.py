@@ -123,3 +123,21 @@ def test_memory_reporter_types():
   # int and string that stringify to the same key should return the values.
   assert reader.read(1) == ["face", "cake"]
   assert reader.read("1") == reader.read(1)
+
+
+def test_memory_reporter_supplied_store():
+  # a caller-supplied dictionary is mutated in place as metrics arrive.
+  store = {"a": [0]}
+  mem = rs.MemoryReporter(store)
+  reader = mem.reader()
+
+  mem.report_all(1, {"a": 1, "b": 2})
+  assert store == {"a": [0, 1], "b": [2]}
+
+  # reading a missing key doesn't create an entry, for either store type.
+  assert reader.read("c") == []
+  assert "c" not in store
+
+  default = rs.MemoryReporter()
+  assert default.reader().read("c") == []
+  assert list(default.reader().keys()) == []
@@ -15,9 +15,12 @@
 # limitations under the License.
 """Tests for the SQL reader and reporter."""
 
+import sqlite3
 import time
 from contextlib import closing
 
+import numpy as np
+import sqlalchemy
 import uv.sql.reporter as sr
 import uv.sql.util as u
 
@@ -45,6 +48,84 @@ def test_sqlite_file_exists(tmp_path):
   assert u.sqlite_file_exists(u.sqlite_engine(f"{tmp_path}.db"))
 
 
+def test_sqlite_pragmas(tmp_path):
+  engine = u.sqlite_engine(str(tmp_path))
+  sr.create_tables(engine)
+
+  with engine.connect() as conn:
+    assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+    # 1 == NORMAL
+    assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+
+
+def test_sqlite_pragmas_existing_db(tmp_path):
+  """Databases that weren't created through create_tables get WAL too, before
+  synchronous is relaxed.
+
+  """
+  location = f"{tmp_path}.db"
+  with closing(sqlite3.connect(location)) as conn:
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+
+  engine = u.sqlite_engine(location)
+  with engine.connect() as conn:
+    assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+    assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+
+
+def test_metrics_index(tmp_path):
+  engine = u.sqlite_engine(str(tmp_path))
+
+  # tables created without the index pick it up on the next create_tables.
+  with engine.begin() as conn:
+    conn.exec_driver_sql("CREATE TABLE metrics (id INTEGER PRIMARY KEY, "
+                         "experiment_id INTEGER, run_id INTEGER, step INTEGER, "
+                         "tag VARCHAR, value REAL)")
+
+  inspector = sqlalchemy.inspect(engine)
+  assert inspector.get_indexes("metrics") == []
+
+  sr.create_tables(engine)
+  inspector = sqlalchemy.inspect(engine)
+  [index] = inspector.get_indexes("metrics")
+  assert index["name"] == "ix_metrics_lookup"
+  assert index["column_names"] == ["experiment_id", "run_id", "tag", "step"]
+
+  # and running it again is a no-op.
+  sr.create_tables(engine)
+
+
+def test_database_exists(tmp_path):
+  engine = u.sqlite_engine(str(tmp_path))
+  assert not u.database_exists(engine)
+
+  sr.create_tables(engine)
+  assert u.database_exists(engine)
+
+  # once a database has been seen, the result is cached.
+  assert str(engine.url) in u._KNOWN_DATABASES
+
+
+def test_copy_text():
+  """Values are escaped for PostgreSQL's COPY text format."""
+  assert u.copy_text(None) == "\\N"
+  assert u.copy_text(1) == "1"
+  assert u.copy_text(2.5) == "2.5"
+  assert u.copy_text("a\tb\nc\\d") == "a\\tb\\nc\\\\d"
+
+
+def test_read_all_agg_stmt():
+  """The PostgreSQL read_all query aggregates each tag's metrics in step order."""
+  from sqlalchemy.dialects import postgresql
+
+  sql = str(sr._READ_ALL_AGG_STMT.compile(dialect=postgresql.dialect()))
+  assert "array_agg(metrics.step ORDER BY metrics.step)" in sql
+  assert "array_agg(metrics.value ORDER BY metrics.step)" in sql
+  assert "GROUP BY metrics.tag" in sql
+
+
 def test_rep_string():
   """Check that the custom representation string works for both of our types."""
   metric = sr.Metric(id=10, step=1)
@@ -96,3 +177,133 @@ def test_of_sql_roundtrip(tmp_path):
 
         # Checking for a key that doesn't exist returns an empty list.
         assert reader.read("face") == []
+
+
+def test_sql_flush_every(tmp_path):
+  engine = u.sqlite_engine(str(tmp_path))
+  sr.create_tables(engine)
+  experiment = sr.Experiment(id=1)
+
+  with pytest.raises(ValueError):
+    sr.SQLReporter(engine, experiment, 0, flush_every=0)
+
+  reporter = sr.SQLReporter(engine, experiment, 0, flush_every=2)
+  reader = reporter.reader()
+
+  # nothing hits the database until flush_every steps have been reported.
+  reporter.report_all(0, {"a": 1})
+  assert reader.read("a") == []
+
+  reporter.report_all(1, {"a": 2})
+  assert reader.read("a") == [{
+      "step": 0,
+      "value": 1.0
+  }, {
+      "step": 1,
+      "value": 2.0
+  }]
+
+  # close flushes any stragglers.
+  reporter.report_all(2, {"a": 3})
+  reporter.close()
+  assert reader.read("a")[-1] == {"step": 2, "value": 3.0}
+
+
+def test_sql_read_arrays(tmp_path):
+  engine = u.sqlite_engine(str(tmp_path))
+  sr.create_tables(engine)
+
+  with closing(sr.SQLReporter(engine, sr.Experiment(id=1), 0)) as reporter:
+    reader = reporter.reader()
+    reporter.report_all(1, {"a": 2})
+    reporter.report_all(0, {"a": 1})
+    reporter.report_all(2, {"a": float("nan")})
+
+    steps, values = reader.read_arrays("a")
+    assert steps.dtype == np.int64
+    assert values.dtype == np.float64
+    assert steps.tolist() == [0, 1, 2]
+    assert values[:2].tolist() == [1.0, 2.0]
+    assert np.isnan(values[2])
+
+    steps, values = reader.read_arrays("face")
+    assert len(steps) == 0 and len(values) == 0
+
+
+def test_sql_flush_failure_keeps_buffer(tmp_path, monkeypatch):
+  engine = u.sqlite_engine(str(tmp_path))
+  sr.create_tables(engine)
+
+  reporter = sr.SQLReporter(engine, sr.Experiment(id=1), 0, flush_every=10)
+  prefixed = reporter.with_prefix("p")
+  reader = prefixed.reader()
+
+  prefixed.report_all(0, {"a": 1})
+  prefixed.report_all(1, {"a": 2})
+
+  # a failed write leaves the buffered metrics in place...
+  def fail():
+    raise RuntimeError("database is down")
+
+  monkeypatch.setattr(engine, "begin", fail)
+  with pytest.raises(RuntimeError):
+    prefixed.flush()
+
+  # ...so the next flush, which reaches through the prefix wrapper, writes them
+  # out.
+  monkeypatch.undo()
+  prefixed.flush()
+  assert [m["step"] for m in reader.read("a")] == [0, 1]
+
+  # and they're not written twice.
+  prefixed.flush()
+  assert len(reader.read("a")) == 2
+
+
+class FakeCopyCursor():
+  """Records whatever gets passed to copy_expert."""
+
+  def __init__(self, log):
+    self._log = log
+
+  def copy_expert(self, sql, buf):
+    self._log.append((sql, buf.read()))
+
+  def close(self):
+    pass
+
+
+class FakeRawConnection():
+
+  def __init__(self, log):
+    self._log = log
+    self.committed = False
+    self.closed = False
+
+  def cursor(self):
+    return FakeCopyCursor(self._log)
+
+  def commit(self):
+    self.committed = True
+
+  def close(self):
+    self.closed = True
+
+
+def test_sql_copy(tmp_path, monkeypatch):
+  engine = u.sqlite_engine(str(tmp_path))
+  sr.create_tables(engine)
+
+  log = []
+  raw = FakeRawConnection(log)
+  monkeypatch.setattr(u, "supports_copy", lambda engine: True)
+  monkeypatch.setattr(engine, "raw_connection", lambda: raw)
+
+  reporter = sr.SQLReporter(engine, sr.Experiment(id=3), 1)
+  reporter.report_all(5, {"a\tb\nc": 1.5, "d": float("nan")})
+
+  [(sql, contents)] = log
+  assert sql == ("COPY metrics (experiment_id, run_id, step, tag, value) "
+                 "FROM STDIN WITH (FORMAT text)")
+  assert contents == "3\t1\t5\ta\\tb\\nc\t1.5\n3\t1\t5\td\tnan\n"
+  assert raw.committed and raw.closed
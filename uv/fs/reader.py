@@ -19,16 +19,38 @@ information on the library.
 
 """
 
-import json
-from typing import Iterable, List, Union
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import fs as pyfs
+import numpy as np
 import uv.fs.util as u
 import uv.types as t
 from casfs.base import CASFS, Key
 from fs.base import FS
 from fs.zipfs import ZipFS
 from uv.reader.base import AbstractReader, IterableReader
+from uv.util import json_loads
+
+try:
+  import msgspec
+except ModuleNotFoundError:  # pragma: no cover
+  msgspec = None
+
+
+@functools.lru_cache(maxsize=None)
+def _step_value_decoder(step_key: str):
+  """Returns a msgspec decoder for metrics written by a reporter stepped with
+  step_key. Decoded records expose .step and .value; any other fields in the
+  record are ignored.
+
+  """
+  struct = msgspec.defstruct("_StepValue", [("step", int), ("value", float)],
+                             rename={"step": step_key})
+  return msgspec.json.Decoder(struct)
 
 
 class FSReader(AbstractReader, IterableReader):
@@ -37,33 +59,153 @@ class FSReader(AbstractReader, IterableReader):
 
   Args:
     fs: Either an fs URI string, or an actual fs.base.FS object.
+    cache_size: maximum number of parsed files to keep in memory. If > 0,
+                read(k) returns a new list of the cached records for a file as
+                long as its modification time and size haven't changed. The
+                record dicts themselves are shared between calls, so treat
+                them as read-only. Each read costs an extra getinfo call on
+                the filesystem. Defaults to 0, which disables caching.
+    step_key: the key that a stepped reporter stored the step under. Only used
+              by read_arrays. Defaults to "step".
 
   """
 
-  def __init__(self, fs: Union[FS, str]):
+  def __init__(self,
+               fs: Union[FS, str],
+               cache_size: int = 0,
+               step_key: Optional[str] = None):
+    if step_key is None:
+      step_key = "step"
+
     self._fs = u.load_fs(fs)
+    self._step_key = step_key
+    self._cache_size = cache_size
+    self._cache = OrderedDict()
+    self._lock = threading.Lock()
 
   def keys(self) -> Iterable[t.Metric]:
     """Returns all files in the filesystem that plausibly contains metrics in jsonl
     format.
 
     """
-    for p in self._fs.walk.files(filter=['*.jsonl']):
-      base = pyfs.path.basename(p)
-      k, _ = pyfs.path.splitext(base)
-      yield k
+    suffix_len = len(".jsonl")
+    for match in self._fs.glob("**/*.jsonl"):
+      base = match.path.rsplit("/", 1)[-1]
+      yield base[:-suffix_len]
+
+  def read_iter(self, k: t.MetricKey) -> Iterator[t.Metric]:
+    """Returns an iterator that lazily parses the metrics logged for the supplied
+    key, one line at a time. Use this instead of read for very large files that
+    you don't want to buffer in memory.
+
+    The underlying file stays open until the iterator is exhausted or closed.
+
+    """
+    mode = u.jsonl_read_mode()
+    encoding = None if 'b' in mode else 'utf-8'
 
-  def read(self, k: t.MetricKey) -> List[t.Metric]:
     try:
-      abs_path = u.jsonl_path(k)
-      with self._fs.open(abs_path, mode='rb') as handle:
-        lines = handle.read().splitlines()
-        return [json.loads(s.decode("utf-8")) for s in lines]
+      handle = self._fs.open(u.jsonl_path(k), mode=mode, encoding=encoding)
+    except pyfs.errors.ResourceNotFound:
+      return
 
+    with handle:
+      for line in handle:
+        if line.strip():
+          yield json_loads(line)
+
+  def read(self, k: t.MetricKey) -> List[t.Metric]:
+    if self._cache_size <= 0:
+      return list(self.read_iter(k))
+
+    abs_path = u.jsonl_path(k)
+    try:
+      info = self._fs.getinfo(abs_path, namespaces=['details'])
     except pyfs.errors.ResourceNotFound:
       return []
 
+    stamp = (info.modified, info.size)
+    with self._lock:
+      hit = self._cache.get(abs_path)
+      if hit is not None and hit[0] == stamp:
+        self._cache.move_to_end(abs_path)
+        return list(hit[1])
+
+    ret = list(self.read_iter(k))
+
+    with self._lock:
+      self._cache[abs_path] = (stamp, ret)
+      self._cache.move_to_end(abs_path)
+
+      while len(self._cache) > self._cache_size:
+        self._cache.popitem(last=False)
+
+    # records are shared with the cache; only the list is the caller's own.
+    return list(ret)
+
+  def read_arrays(self, k: t.MetricKey) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the metrics logged for the supplied key by a stepped reporter as a
+    pair of numpy arrays, (steps, values), in file order.
+
+    The file is read into memory as raw bytes. If msgspec is installed, those
+    bytes are decoded in a single pass against a typed schema and the arrays are
+    filled straight from the decoded records, without building a dict per
+    record. Otherwise, or if any record doesn't fit the schema (NaN values, for
+    example), this falls back to the generic parser.
+
+    """
+    try:
+      with self._fs.open(u.jsonl_path(k), mode='rb') as handle:
+        buf = handle.read()
+    except pyfs.errors.ResourceNotFound:
+      buf = b""
+
+    step_key = self._step_key
+
+    if msgspec is not None:
+      try:
+        records = _step_value_decoder(step_key).decode_lines(buf)
+      except msgspec.DecodeError:
+        pass
+      else:
+        n = len(records)
+        steps = np.fromiter((r.step for r in records), dtype=np.int64, count=n)
+        values = np.fromiter((r.value for r in records),
+                             dtype=np.float64,
+                             count=n)
+        return steps, values
+
+    records = [json_loads(line) for line in buf.splitlines() if line.strip()]
+    n = len(records)
+    steps = np.fromiter((m[step_key] for m in records), dtype=np.int64, count=n)
+    values = np.fromiter(
+        (np.nan if m["value"] is None else m["value"] for m in records),
+        dtype=np.float64,
+        count=n)
+    return steps, values
+
+  def read_many(self,
+                ks: List[t.MetricKey],
+                max_workers: int = 16) -> Dict[t.MetricKey, List[t.Metric]]:
+    """Same contract as read_all, but reads the supplied keys concurrently on a
+    pool of up to max_workers threads. Use this with remote filesystems (GCS,
+    S3), where each read is dominated by a network round trip.
+
+    """
+    ks = list(ks)
+    if not ks:
+      return {}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ks))) as ex:
+      return dict(zip(ks, ex.map(self.read, ks)))
+
+  def clear_cache(self) -> None:
+    """Drops all parsed files held in memory by this reader."""
+    with self._lock:
+      self._cache.clear()
+
   def close(self) -> None:
+    self.clear_cache()
     self._fs.close()
 
 
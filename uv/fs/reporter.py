@@ -41,31 +41,53 @@ class FSReporter(AbstractReporter):
 
   Args:
     fs: Either an fs URI string, or an actual fs.base.FS object.
+    flush_every: number of report_all calls to buffer in memory before writing
+                 to the filesystem. Each file then receives a single write per
+                 flush. Any buffered metrics are written on flush() or close();
+                 both pass through wrappers like stepped() or with_prefix().
 
   """
 
-  def __init__(self, fs: Union[FS, str]):
+  def __init__(self, fs: Union[FS, str], flush_every: int = 1):
+    if flush_every < 1:
+      raise ValueError("flush_every must be >= 1.")
+
     self._fs = u.load_fs(fs)
     self._cache = u.HandleCache(self._fs)
+    self._flush_every = flush_every
+    self._pending = 0
+    self._buffers = {}
+
+  def report_all(self, step: int, m: Dict[t.MetricKey, t.Metric]) -> None:
+    # buffers are keyed by path, so that keys like 1 and "1" that share a file
+    # keep their relative order.
+    buffers = self._buffers
+    for k, v in m.items():
+      buffers.setdefault(u.jsonl_path(k), []).append(u.jsonl_bytes(v))
 
-  def _handle(self, k: t.MetricKey):
-    """Returns an open handle that points to the file containing the metrics for
-    k.
+    self._pending += 1
+    if self._pending >= self._flush_every:
+      self.flush()
+
+  def flush(self) -> None:
+    """Writes all buffered metrics out to their files. A file's buffer is only
+    dropped once its write succeeds, so a failed flush can be retried.
 
     """
-    json_path = u.jsonl_path(k)
-    return self._cache.open(json_path, mode='wb')
+    buffers = self._buffers
 
-  def report_all(self, step: int, m: Dict[t.MetricKey, t.Metric]) -> None:
-    for k, v in m.items():
-      handle = self._handle(k)
-      contents = u.jsonl_bytes(v)
-      handle.write(contents)
+    for path in list(buffers):
+      handle = self._cache.open(path, mode='wb')
+      handle.write(b"".join(buffers[path]))
       handle.flush()
+      del buffers[path]
+
+    self._pending = 0
 
   def reader(self) -> rb.AbstractReader:
     return FSReader(self._fs)
 
   def close(self) -> None:
+    self.flush()
     self._cache.close()
     self._fs.close()
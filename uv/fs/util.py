@@ -100,6 +100,15 @@ def jsonl_bytes(v: Any) -> bytes:
   return to_bytes(u.json_str(v) + "\n")
 
 
+def jsonl_read_mode() -> str:
+  """Returns the mode to open jsonl files with for parsing. orjson parses bytes
+  directly; the stdlib json module is faster if the file is decoded as a text
+  stream, in chunks, than if it decodes every line separately.
+
+  """
+  return 'rb' if u.orjson is not None else 'r'
+
+
 def get_cas(cas_input):
   """Version of the CASFS constructor that creates directories that don't exist.
   TODO delete this once we get that idea merged back into CASFS.
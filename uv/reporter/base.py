@@ -83,6 +83,13 @@ class AbstractReporter(metaclass=ABCMeta):
     """
     return None
 
+  def flush(self) -> None:
+    """Write out any metrics that this reporter has buffered but not yet
+    persisted. Returns None by default; reporters that buffer should override.
+
+    """
+    return None
+
   def close(self) -> None:
     """Release any resources held open by this reporter instance."""
     return None
@@ -254,6 +261,12 @@ class FilterValuesReporter(AbstractReporter):
   def reader(self) -> Optional[rb.AbstractReader]:
     return self._base.reader()
 
+  def flush(self) -> None:
+    self._base.flush()
+
+    if self._on_false_reporter:
+      self._on_false_reporter.flush()
+
   def close(self) -> None:
     self._base.close()
 
@@ -292,6 +305,9 @@ class MapValuesReporter(AbstractReporter):
   def reader(self) -> Optional[rb.AbstractReader]:
     return self._base.reader()
 
+  def flush(self) -> None:
+    self._base.flush()
+
   def close(self) -> None:
     self._base.close()
 
@@ -317,6 +333,10 @@ class MultiReporter(AbstractReporter):
     for r in self._reporters:
       r.report(step, k, v)
 
+  def flush(self) -> None:
+    for r in self._reporters:
+      r.flush()
+
   def close(self) -> None:
     for r in self._reporters:
       r.close()
@@ -352,6 +372,9 @@ class PrefixedReporter(AbstractReporter):
   def reader(self) -> Optional[rb.AbstractReader]:
     return rb.PrefixedReader(self._base.reader(), self._prefix)
 
+  def flush(self) -> None:
+    self._base.flush()
+
   def close(self) -> None:
     self._base.close()
 
@@ -386,6 +409,9 @@ class SuffixedReporter(AbstractReporter):
   def reader(self) -> Optional[rb.AbstractReader]:
     return rb.SuffixedReader(self._base.reader(), self._suffix)
 
+  def flush(self) -> None:
+    self._base.flush()
+
   def close(self) -> None:
     self._base.close()
 
@@ -423,5 +449,8 @@ class ThunkReporter(AbstractReporter):
   def reader(self) -> Optional[rb.AbstractReader]:
     return self._base.reader()
 
+  def flush(self) -> None:
+    self._base.flush()
+
   def close(self) -> None:
     self._base.close()
@@ -20,6 +20,7 @@ metrics into underlying store or mechanism.
 """
 
 import sys
+from collections import defaultdict
 from typing import Callable, Dict, List, Optional
 
 import uv.reader.base as rb
@@ -127,18 +128,21 @@ class LoggingReporter(AbstractReporter):
 
     self._file = file
     self._digits = digits
+    self._spec = ".{}f".format(digits)
 
-  def _format(self, v: t.Metric) -> str:
-    """Formats the value into something appropriate for logging."""
-    if u.is_number(v):
-      return "{num:.{digits}f}".format(num=float(v), digits=self._digits)
+  def report_all(self, step: int, m: Dict[t.MetricKey, t.Metric]) -> None:
+    spec = self._spec
+    parts = []
+    append = parts.append
 
-    return str(v)
+    for k, v in m.items():
+      # the isinstance check short-circuits the try/except inside is_number for
+      # plain python numbers, the common case.
+      if isinstance(v, (int, float)) or u.is_number(v):
+        v = format(float(v), spec)
+      append(f"{k} = {v}")
 
-  def report_all(self, step: int, m: Dict[t.MetricKey, t.Metric]) -> None:
-    s = ", ".join(["{} = {}".format(k, self._format(v)) for k, v in m.items()])
-    f = self._file
-    print("Step {}: {}".format(step, s), file=f)
+    print(f"Step {step}: {', '.join(parts)}", file=self._file)
 
 
 class MemoryReporter(AbstractReporter):
@@ -156,7 +160,7 @@ class MemoryReporter(AbstractReporter):
                m: Optional[Dict[str, List[t.Metric]]] = None,
                params_store: Optional[Dict[str, str]] = None):
     if m is None:
-      m = {}
+      m = defaultdict(list)
 
     if params_store is None:
       params_store = {}
@@ -171,8 +175,18 @@ class MemoryReporter(AbstractReporter):
     self._params.update({**m})
 
   def report_all(self, step: int, m: Dict[t.MetricKey, t.Metric]) -> None:
-    for k, v in m.items():
-      self._m.setdefault(str(k), []).append(v)
+    store = self._m
+
+    # the default store is a defaultdict, which saves the setdefault lookup and
+    # empty list allocation per metric. Dictionaries supplied by the caller
+    # still need to be mutated in place.
+    if isinstance(store, defaultdict) and store.default_factory is list:
+      for k, v in m.items():
+        store[str(k)].append(v)
+    else:
+      setdefault = store.setdefault
+      for k, v in m.items():
+        setdefault(str(k), []).append(v)
 
   def clear(self):
     """Erase all key-value pairs in the backing store."""
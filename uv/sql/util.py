@@ -19,10 +19,10 @@
 
 import os
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.engine import Engine
 from sqlalchemy.engine.url import URL
-from typing import Union
+from typing import Any, Union
 
 
 def sqlite_engine(location: str, verbose=False) -> Engine:
@@ -32,7 +32,23 @@ def sqlite_engine(location: str, verbose=False) -> Engine:
   if not location.endswith(".db"):
     location = f"{location}.db"
 
-  return create_engine(f'sqlite:///{location}', echo=verbose)
+  engine = create_engine(f'sqlite:///{location}', echo=verbose)
+
+  @event.listens_for(engine, "connect")
+  def _set_pragmas(dbapi_conn, _):
+    # Switch the database over to WAL (this sticks in the file) for databases
+    # that didn't go through create_tables. synchronous is a per-connection
+    # setting; NORMAL skips the fsync on every commit, but is only safe against
+    # power loss in WAL mode, so we only relax it if the switch took.
+    cursor = dbapi_conn.cursor()
+    try:
+      mode = cursor.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+      if mode.lower() == "wal":
+        cursor.execute("PRAGMA synchronous=NORMAL")
+    finally:
+      cursor.close()
+
+  return engine
 
 
 def sqlite_file_exists(arg: Union[Engine, URL]) -> bool:
@@ -57,6 +73,63 @@ def sqlite_file_exists(arg: Union[Engine, URL]) -> bool:
     return header[:16] == b'SQLite format 3\x00'
 
 
+# URLs of sqlite databases that we've already seen on disk.
+_KNOWN_DATABASES = set()
+
+
+def database_exists(engine: Engine) -> bool:
+  """Returns True if the database that the engine points to exists. Only sqlite
+  databases are actually checked; for any other dialect we assume that the
+  database exists and let the first query fail if it doesn't.
+
+  Positive results are cached for the lifetime of the process, so creating many
+  short-lived readers against the same database only touches the filesystem
+  once. Negative results aren't cached, since the database may be created
+  later.
+
+  """
+  if engine.dialect.name != "sqlite":
+    return True
+
+  url = str(engine.url)
+  if url in _KNOWN_DATABASES:
+    return True
+
+  exists = sqlite_file_exists(engine)
+  if exists:
+    _KNOWN_DATABASES.add(url)
+
+  return exists
+
+
+def supports_copy(engine: Engine) -> bool:
+  """Returns True if the engine can bulk-load rows using PostgreSQL's COPY FROM
+  STDIN via psycopg2's copy_expert.
+
+  """
+  dialect = engine.dialect
+  return dialect.name == "postgresql" and dialect.driver == "psycopg2"
+
+
+_COPY_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    "\t": "\\t",
+    "\n": "\\n",
+    "\r": "\\r"
+})
+
+
+def copy_text(v: Any) -> str:
+  """Formats a single value as a field in PostgreSQL's COPY text format."""
+  if v is None:
+    return "\\N"
+
+  if isinstance(v, str):
+    return v.translate(_COPY_ESCAPES)
+
+  return str(v)
+
+
 def rep_string(instance):
   """Returns a pretty string representation for sqlalchemy classes."""
   klass = instance.__class__
@@ -18,11 +18,16 @@
 import datetime
 import json
 from functools import singledispatch
-from typing import Any, List
+from typing import Any, List, Union
 
 import numpy as np
 import tqdm
 
+try:
+  import orjson
+except ModuleNotFoundError:  # pragma: no cover
+  orjson = None
+
 
 def to_metric(v: Any) -> float:
   """Converts the incoming item into something we can log.
@@ -72,6 +77,23 @@ def json_str(item: Any) -> str:
   return json.dumps(item, default=to_serializable)
 
 
+def json_loads(s: Union[str, bytes]) -> Any:
+  """Parses the supplied json string or bytes instance.
+
+  Uses orjson if it's installed, falling back to the standard library's json
+  module for any input that orjson rejects (NaN and Infinity, for example, which
+  json_str happily emits for float metrics).
+
+  """
+  if orjson is not None:
+    try:
+      return orjson.loads(s)
+    except orjson.JSONDecodeError:
+      pass
+
+  return json.loads(s)
+
+
 def uuid():  # pragma: no cover
   """Generates a sane UUID for use in test files and metric directories."""
   return datetime.datetime.now().strftime('%Y%m%d_%H%M%S')